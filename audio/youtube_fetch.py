@@ -1,33 +1,166 @@
+from concurrent.futures import ThreadPoolExecutor
 import importlib.util
 import subprocess
+import hashlib
+import atexit
+import shutil
 import sys
 import os
 
+# Heavy imports (yt-dlp registers all its extractors) are paid once at startup.
+# They only exist inside the venv: the bootstrap run installs them, then restarts there.
+try:
+    import yt_dlp
+    from imageio_ffmpeg import get_ffmpeg_exe
+except ImportError:
+    yt_dlp = None
+    get_ffmpeg_exe = None
+
 MUSIC_DIR = "audiofiles"
 
 VENV_DIR = ".venv"
 PYTHON_EXEC = os.path.join(VENV_DIR, "Scripts" if os.name == "nt" else "bin", "python")
-PIP_EXEC = os.path.join(VENV_DIR, "Scripts" if os.name == "nt" else "bin", "pip")
 
 DEPENDENCIES = ["yt-dlp", "imageio[ffmpeg]"]
 
+# Stamp written once all dependencies are installed; a shared prototype site-packages is hardlinked into fresh checkouts
+READY_STAMP = ".ready"
+VENV_PROTO_DIR = os.path.join(os.path.expanduser("~"), ".cache", "musigait", "venv-proto")
+
+# Persistent yt-dlp cache (player signature extraction) shared by all venvs/runs
+YTDLP_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "musigait", "ytdlp")
+
+# Shared YoutubeDL instance (extractors are set up once per process) and the current download's callback
+_YDL = None
+_on_downloaded = None
+
+# FFmpeg binary bundled with imageio[ffmpeg], resolved once
+FFMPEG_PATH = None
+if get_ffmpeg_exe is not None:
+    try:
+        FFMPEG_PATH = get_ffmpeg_exe()
+    except RuntimeError:
+        pass
+
 
-def is_installed(package):
-    """Check if a package is installed inside the virtual environment."""
+def installed_packages():
+    """Return the lowercase names of all distributions installed in the virtual environment."""
     try:
         result = subprocess.run(
-            [PIP_EXEC, "show", package.split("[")[0]],  # Extract package name if using extras
+            [PYTHON_EXEC, "-c",
+             "import importlib.metadata as m; "
+             "print('\\n'.join(d.metadata['Name'] or '' for d in m.distributions()))"],
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             text=True
         )
-        return result.returncode == 0
+        if result.returncode != 0:
+            return set()
+        return {name.strip().lower() for name in result.stdout.splitlines() if name.strip()}
     except Exception:
+        return set()
+
+
+def is_installed(package, installed):
+    """Check if a package is in the set of installed distributions."""
+    return package.split("[")[0].lower() in installed  # Extract package name if using extras
+
+
+def venv_key():
+    """Hash identifying the dependency set and base interpreter a venv was built for."""
+    return hashlib.sha256(repr((sorted(DEPENDENCIES), sys.version, sys.executable)).encode()).hexdigest()
+
+
+def is_ready(venv_dir):
+    """Check if a venv was fully set up for the current dependency set."""
+    try:
+        with open(os.path.join(venv_dir, READY_STAMP)) as f:
+            return f.read().strip() == venv_key()
+    except OSError:
+        return False
+
+
+def mark_ready(venv_dir):
+    """Write the ready stamp once every install step has succeeded."""
+    with open(os.path.join(venv_dir, READY_STAMP), "w") as f:
+        f.write(venv_key())
+
+
+def link_or_copy(src, dst):
+    """Hardlink a file, falling back to a copy across filesystems."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def site_packages_dir():
+    """Return the site-packages path of the venv, relative to the venv root."""
+    result = subprocess.run(
+        [PYTHON_EXEC, "-c",
+         "import os, sys, sysconfig; print(os.path.relpath(sysconfig.get_path('purelib'), sys.prefix))"],
+        stdout=subprocess.PIPE,
+        text=True,
+        check=True
+    )
+    return result.stdout.strip()
+
+
+def link_tree(src, dst):
+    """Hardlink a directory tree into place through a temporary sibling, so dst is never left half-copied."""
+    tmp = f"{dst}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    try:
+        shutil.copytree(src, tmp, symlinks=True, copy_function=link_or_copy)
+        shutil.rmtree(dst, ignore_errors=True)
+        os.replace(tmp, dst)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def clone_venv():
+    """
+    Create the venv and hardlink the prototype's site-packages into it; returns False on failure.
+
+    Only site-packages is shared: `venv` writes bin/ and the activate scripts for this checkout,
+    so nothing in the clone points back at the venv the prototype was seeded from.
+    """
+    try:
+        subprocess.run([sys.executable, "-m", "venv", "--without-pip", VENV_DIR], check=True)
+        site_packages = site_packages_dir()
+        link_tree(os.path.join(VENV_PROTO_DIR, site_packages), os.path.join(VENV_DIR, site_packages))
+    except (subprocess.CalledProcessError, OSError, shutil.Error) as e:
+        print(f"Could not clone venv from {VENV_PROTO_DIR}: {e}")
         return False
 
+    mark_ready(VENV_DIR)
+    return True
+
+
+def seed_prototype():
+    """Share the venv's site-packages as the prototype for later fresh venvs."""
+    shutil.rmtree(VENV_PROTO_DIR, ignore_errors=True)
+    try:
+        site_packages = site_packages_dir()
+        link_tree(os.path.join(VENV_DIR, site_packages), os.path.join(VENV_PROTO_DIR, site_packages))
+    except (subprocess.CalledProcessError, OSError, shutil.Error) as e:
+        print(f"Could not cache venv in {VENV_PROTO_DIR}: {e}")
+        return
+
+    mark_ready(VENV_PROTO_DIR)
+
 
 def setup_venv():
     """Sets up a virtual environment and installs dependencies if needed."""
+    if is_ready(VENV_DIR):
+        return
+
+    if not os.path.exists(VENV_DIR) and is_ready(VENV_PROTO_DIR):
+        print("Cloning virtual environment from cache...")
+        if clone_venv():
+            return
+
     if not os.path.exists(VENV_DIR):
         print("Creating virtual environment...")
         try:
@@ -44,8 +177,9 @@ def setup_venv():
         print(f"Error installing/upgrading pip: {e}")
         sys.exit(1)
 
-    # Install dependencies if missing
-    missing_dependencies = [pkg for pkg in DEPENDENCIES if not is_installed(pkg)]
+    # Install dependencies if missing (single metadata scan instead of one `pip show` per package)
+    installed = installed_packages()
+    missing_dependencies = [pkg for pkg in DEPENDENCIES if not is_installed(pkg, installed)]
     if missing_dependencies:
         print(f"Installing missing dependencies: {', '.join(missing_dependencies)}")
         try:
@@ -54,70 +188,122 @@ def setup_venv():
             print(f"Error installing dependencies: {e}")
             sys.exit(1)
 
+    mark_ready(VENV_DIR)
 
-def download_audio(youtube_url):
-    """Downloads audio from a YouTube video and saves it as a WAV file named after the title."""
-    import yt_dlp
-    from imageio_ffmpeg import get_ffmpeg_exe
-    import re
+    # Seed the shared prototype so later fresh venvs are hardlinked instead of rebuilt
+    if not is_ready(VENV_PROTO_DIR):
+        seed_prototype()
 
-    # Ensure audiofiles directory exists
-    os.makedirs("audiofiles", exist_ok=True)
 
-    # Setup a temporary YDL instance to get video info
-    with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
-        try:
-            info = ydl.extract_info(youtube_url, download=False)
-            title = info.get("title", "audio").strip()
-            # Sanitize title to be a valid filename
-            safe_title = re.sub(r'[\\/*?:"<>|]', "_", title)
-        except yt_dlp.utils.DownloadError as e:
-            print(f"Error fetching video info: {e}")
-            sys.exit(1)
+def convert_to_wav(ffmpeg_path, source_path):
+    """Converts a downloaded audio file to a 44.1 kHz stereo WAV next to it and removes the source."""
+    wav_path = os.path.splitext(source_path)[0] + ".wav"
+    try:
+        subprocess.run(
+            [ffmpeg_path, "-y", "-loglevel", "error", "-i", source_path, "-vn", "-ar", "44100", "-ac", "2", wav_path],
+            check=True
+        )
+    except subprocess.CalledProcessError as e:
+        print(f"Error converting {source_path} to WAV: {e}")
+        return None
+
+    os.remove(source_path)
+    print(f"Saved {wav_path}")
+    return wav_path
+
+
+def postprocessor_hook(d):
+    """Hand each finished download to the callback of the current download_audio call."""
+    # MoveFiles is the last postprocessor: the downloaded file is in place and ready to convert
+    if d['status'] == 'finished' and d['postprocessor'] == 'MoveFiles' and _on_downloaded is not None:
+        _on_downloaded(d['info_dict']['filepath'])
 
-    output_path = os.path.join("audiofiles", f"{safe_title}.%(ext)s")
 
-    # Get FFmpeg path
-    ffmpeg_path = get_ffmpeg_exe()
-    if not os.path.exists(ffmpeg_path):
+def get_ydl(ffmpeg_path):
+    """Returns the shared YoutubeDL instance, creating it on first use."""
+    global _YDL
+    if _YDL is None:
+        ydl_opts = {
+            'format': 'bestaudio/best',
+            'noplaylist': True,
+            'concurrent_fragment_downloads': 8,
+            'postprocessor_hooks': [postprocessor_hook],
+            'outtmpl': os.path.join(MUSIC_DIR, "%(title)s.%(ext)s"),  # yt-dlp fills in and sanitizes the title
+            'windowsfilenames': True,
+            'ffmpeg_location': ffmpeg_path,
+            'cachedir': YTDLP_CACHE_DIR,
+            'http_headers': {'Connection': 'keep-alive'}
+        }
+        # aria2c fetches fragments over several connections when it is installed
+        if shutil.which("aria2c"):
+            ydl_opts['external_downloader'] = {'default': 'aria2c'}
+
+        os.makedirs(YTDLP_CACHE_DIR, exist_ok=True)
+        _YDL = yt_dlp.YoutubeDL(ydl_opts)
+        atexit.register(_YDL.close)
+    return _YDL
+
+
+def download_audio(youtube_url, executor=None):
+    """
+    Downloads audio from a YouTube video and saves it as a WAV file named after the title.
+
+    With an executor, the WAV conversion runs in the background so the next URL can download meanwhile.
+    Returns the futures (or paths, without an executor) of the converted files.
+    """
+    if yt_dlp is None:
+        print("yt-dlp is not installed. Run this script outside the virtual environment to set it up.")
+        sys.exit(1)
+
+    # Ensure audiofiles directory exists
+    os.makedirs(MUSIC_DIR, exist_ok=True)
+
+    # Check FFmpeg path
+    ffmpeg_path = FFMPEG_PATH
+    if not ffmpeg_path or not os.path.exists(ffmpeg_path):
         print("FFmpeg not found. Please install it or ensure it's accessible.")
         sys.exit(1)
 
-    ydl_opts = {
-        'format': 'bestaudio/best',
-        'noplaylist': True,
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'wav',
-        }],
-        'postprocessor_args': ['-ar', '44100', '-ac', '2'],
-        'outtmpl': output_path,
-        'ffmpeg_location': ffmpeg_path
-    }
-
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        try:
-            ydl.download([youtube_url])
-        except yt_dlp.utils.DownloadError as e:
-            print(f"Error downloading video: {e}")
-            sys.exit(1)
+    conversions = []
+
+    def on_downloaded(source_path):
+        if executor is not None:
+            conversions.append(executor.submit(convert_to_wav, ffmpeg_path, source_path))
+        else:
+            conversions.append(convert_to_wav(ffmpeg_path, source_path))
+
+    global _on_downloaded
+    _on_downloaded = on_downloaded
+    try:
+        get_ydl(ffmpeg_path).download([youtube_url])
+    except yt_dlp.utils.DownloadError as e:
+        print(f"Error downloading video: {e}")
+        sys.exit(1)
+    finally:
+        _on_downloaded = None
+
+    return conversions
 
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python youtube_fetch.py <YouTube_URL>")
+        print("Usage: python youtube_fetch.py <YouTube_URL> [<YouTube_URL> ...]")
         sys.exit(1)
 
-    video_url = sys.argv[1]
+    video_urls = sys.argv[1:]
 
     # Check if already running inside the virtual environment
     if os.path.exists(VENV_DIR) and sys.prefix == os.path.abspath(VENV_DIR):
-        download_audio(video_url)
+        # Convert each file while the next one downloads
+        with ThreadPoolExecutor() as executor:
+            conversions = [c for url in video_urls for c in download_audio(url, executor)]
+        if not all(c.result() for c in conversions):
+            sys.exit(1)
     else:
         # Step 1: Setup Virtual Environment & Install Dependencies
         setup_venv()
 
         # Step 2: Restart the script inside the virtual environment **only once**
         print("Restarting inside virtual environment...")
-        subprocess.run([PYTHON_EXEC, __file__, video_url], check=True)
+        subprocess.run([PYTHON_EXEC, __file__] + video_urls, check=True)
         sys.exit(0)
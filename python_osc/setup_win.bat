@@ -19,6 +19,13 @@ if errorlevel 1 (
 	"%PYTHON_EXEC%" -m pip install python-osc || (echo [FATAL] install failed ^(offline/proxy?^). & exit /b 1)
 )
 
+REM Optional: orjson speeds up live JSON decoding; tcp_to_osc.py falls back to stdlib json
+"%PYTHON_EXEC%" -c "import importlib.util, sys; sys.exit(0 if importlib.util.find_spec('orjson') else 1)"
+if errorlevel 1 (
+	echo [INFO] orjson missing; trying to install...
+	"%PYTHON_EXEC%" -m pip install orjson || echo [WARNING] orjson unavailable; using stdlib json.
+)
+
 echo [INFO] Setup complete, launching tcp_to_osc.py...
 
 "%PYTHON_EXEC%" tcp_to_osc.py %*
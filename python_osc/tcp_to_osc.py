@@ -1,22 +1,28 @@
 from pythonosc.osc_server import BlockingOSCUDPServer
 from pythonosc.udp_client import SimpleUDPClient
+from pythonosc.osc_message_builder import OscMessageBuilder
+from pythonosc.osc_bundle_builder import OscBundleBuilder, IMMEDIATELY
 from pythonosc.dispatcher import Dispatcher
-from typing import Callable, Optional
-from collections import deque
+from typing import Callable, Optional, Union
 from pathlib import Path
 from enum import Enum
 import threading
 import argparse
+import queue
 import logging
 import random
 import struct
 import socket
-import copy
 import json
 import time
 import glob
 import os
 
+try:
+	import orjson  # faster decoding of the live packets, optional
+except ImportError:
+	orjson = None
+
 # Server Version
 VERSION = 2
 
@@ -24,6 +30,9 @@ VERSION = 2
 OSC_IP, OSC_PORT = "127.0.0.1", 8000
 osc_client = SimpleUDPClient(OSC_IP, OSC_PORT)
 osc_lock = threading.RLock()
+OSC_BUNDLE_MAX_MESSAGES = 64  # keep each datagram small for Max's udpreceive
+LIVE_QUEUE_MAX_PACKETS = 1024  # live packets awaiting decode; the oldest are dropped beyond this
+LIVE_DROP_LOG_INTERVAL = 5.0   # seconds between "decoder falling behind" warnings
 
 # States
 LAST_STATES: Optional[dict] = None
@@ -35,11 +44,18 @@ EMG_PORTS: list
 EMG_HOST = "127.0.0.1"
 
 CURRENT_SENSORS: list = []
+SENSOR_ADDRESSES: dict = {}  # channel -> OSC address, rebuilt with CURRENT_SENSORS
 
 SOCKETS: list = []
 SOCKETS_TIMEOUT = 2.0        # seconds
 SOCKETS_TIMEOUT_FAST = 0.25  # for short ops
 SOCKETS_TIMEOUT_SLOW = 10.0  # for slow ops
+SOCKETS_RCVBUF = 4 << 20     # kernel receive buffer for the live streams
+MAX_BODY_BYTES = 1 << 30     # larger declared body lengths mean the stream is out of sync
+
+LIVE_STALL_WARNING = 5.0     # seconds without live packets before warning
+RECONNECT_DELAY_MIN = 1.0    # seconds, doubled after each failed reconnect
+RECONNECT_DELAY_MAX = 30.0
 
 IDX_COMMAND = 0        # ports[0] → command port
 IDX_MESSAGE = 1        # ports[1] → message port
@@ -144,9 +160,25 @@ analyzer_config_right = {
 	]
 }
 
+# Serializes analyzer pushes: debounce timers and reconnect resyncs can overlap
+config_lock = threading.Lock()
+
+# Bursts of OSC updates (e.g. slider drags) within this window trigger a single push
+CONFIG_PUSH_DEBOUNCE = 0.05  # seconds
+_config_push_timer: Optional[threading.Timer] = None
+_config_push_lock = threading.Lock()
+
+# Encoded analyzer configs, reset by update_analyzer_config when a side changes
+_analyzer_json: dict = {"left": None, "right": None}
+
 # Header size
 RESPONSE_HEADER_BYTES = 24
 
+# Precompiled wire formats (little-endian)
+PACKET_STRUCT = struct.Struct('<II')        # version + command / id / payload length
+HEADER_STRUCT = struct.Struct('<I I I I Q')  # response header
+LENGTH_STRUCT = struct.Struct('<Q')         # body length
+
 logging.basicConfig(
 	level=logging.INFO, 
 	format='[%(asctime)s.%(msecs)03d] [%(levelname)s] %(message)s', 
@@ -238,12 +270,12 @@ def to_packet(command_int: int) -> bytes:
 	Returns:
 		bytes: Packed 8-byte packet (little-endian).
 	"""
-	return struct.pack("<II", VERSION, command_int)
+	return PACKET_STRUCT.pack(VERSION, command_int)
 
 
-def parse_header(response: bytes) -> dict:
+def parse_header(response: bytes, offset: int = 0) -> dict:
 	"""
-	Interpret a response from the server.
+	Interpret a response from the server, starting at `offset` in the buffer.
 
 	Header structure (little-endian):
 	  1) 4 bytes : protocol version (must == VERSION)
@@ -266,20 +298,20 @@ def parse_header(response: bytes) -> dict:
 			- raw_data (hex str or None)
 	"""
 
-	if not response or len(response) != RESPONSE_HEADER_BYTES:
+	if not response or len(response) - offset < RESPONSE_HEADER_BYTES:
 		return {
 			"error": "Invalid response length",
-			"raw_data": response.hex() if response else None
+			"raw_data": response[offset:].hex() if response else None
 		}
 
-	# Unpack raw fields
-	version, raw_cmd, raw_msg, raw_type, raw_ts = struct.unpack('<I I I I Q', response)
+	# Unpack raw fields in place
+	version, raw_cmd, raw_msg, raw_type, raw_ts = HEADER_STRUCT.unpack_from(response, offset)
 
 	# Check protocol version
 	if version != VERSION:
 		return {
 			"error": f"Invalid protocol version: {version}",
-			"raw_data": response.hex() if response else None
+			"raw_data": response[offset:offset + RESPONSE_HEADER_BYTES].hex()
 		}
 
 	# Convert to enums
@@ -291,7 +323,7 @@ def parse_header(response: bytes) -> dict:
 	except ValueError as e:
 		return {
 			"error": f"Unknown enum value: {e}",
-			"raw_data": response.hex() if response else None
+			"raw_data": response[offset:offset + RESPONSE_HEADER_BYTES].hex()
 		}
 
 	# Format timestamp
@@ -310,20 +342,29 @@ def parse_header(response: bytes) -> dict:
 	}
 
 
-def recv_exact(sock: socket.socket, n: int) -> bytes:
-	"""Read exactly n bytes or raise if the socket closes early."""
-	buf = b""
-	while len(buf) < n:
-		chunk = sock.recv(n - len(buf))
+def recv_exact(sock: socket.socket, n: int) -> bytearray:
+	"""Read exactly n bytes into a preallocated buffer or raise if the socket closes early."""
+	buf = bytearray(n)
+	view = memoryview(buf)
+	received = 0
+	while received < n:
+		chunk = sock.recv_into(view[received:])
 		if not chunk:
 			raise ConnectionError("Socket closed unexpectedly while reading")
-		buf += chunk
+		received += chunk
 	return buf
 
 
-def parse_data_length(length_bytes: bytes) -> int:
-	"""Unpack the 8-byte little-endian length field."""
-	return struct.unpack('<Q', length_bytes)[0]
+def parse_data_length(length_bytes: bytes, offset: int = 0) -> int:
+	"""Unpack the 8-byte little-endian length field at `offset`."""
+	return LENGTH_STRUCT.unpack_from(length_bytes, offset)[0]
+
+
+def loads_json(data: bytes) -> object:
+	"""Decode a UTF-8 JSON payload from any bytes-like object (orjson when available)."""
+	if orjson is not None:
+		return orjson.loads(data)
+	return json.loads(str(data, 'utf-8'))
 
 
 def _cmd_hdr_timeout_for(command: Command) -> float:
@@ -486,13 +527,13 @@ def send_command(sock: socket.socket, command: Command) -> bool:
 		return True
 
 
-def send_extra_data(cmd_sock: socket.socket, msg_sock: socket.socket, extra_data: dict) -> bool:
+def send_extra_data(cmd_sock: socket.socket, msg_sock: socket.socket, extra_data: Union[dict, bytes]) -> bool:
 	"""
-	Send the extra JSON on the message socket, then wait for the final ACK on the *command* socket.
-	Accept final OK or STATES_CHANGED; NOK means failure.
+	Send the extra JSON (a dict, or already encoded bytes) on the message socket, then wait for
+	the final ACK on the *command* socket. Accept final OK or STATES_CHANGED; NOK means failure.
 	"""
-	json_data = json.dumps(extra_data).encode('utf-8')
-	payload = struct.pack('<II', VERSION, len(json_data)) + json_data
+	json_data = extra_data if isinstance(extra_data, bytes) else json.dumps(extra_data).encode('utf-8')
+	payload = PACKET_STRUCT.pack(VERSION, len(json_data)) + json_data
 
 	with msg_lock:
 		# send payload
@@ -562,7 +603,7 @@ def connect_and_handshake(host: str, ports: list) -> Optional[list]:
 
 	# Random ID
 	random_id = random.randint(0x10000000, 0xFFFFFFFE)
-	packet_id = struct.pack('<II', VERSION, random_id)
+	packet_id = PACKET_STRUCT.pack(VERSION, random_id)
 
 	# Attempt to connect to all ports
 	for port in ports:
@@ -578,19 +619,31 @@ def connect_and_handshake(host: str, ports: list) -> Optional[list]:
 				s.close()
 			return False
 
+	# Small command/message packets go out immediately; live streams get room to absorb bursts
+	try:
+		for idx in (IDX_COMMAND, IDX_MESSAGE):
+			sockets[idx].setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+		for idx in (IDX_LIVE_DATA, IDX_LIVE_ANALYSES):
+			sockets[idx].setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKETS_RCVBUF)
+	except (OSError, IndexError) as e:
+		log.warning(f"Could not tune socket options: {e}")
+
 	# Perform handshake on the first socket
 	if len(sockets) == len(ports):
 		handshake_message = to_packet(Command.HANDSHAKE.value)
-		sockets[IDX_COMMAND].sendall(handshake_message)
-
 		orig = sockets[IDX_COMMAND].gettimeout()
-		sockets[IDX_COMMAND].settimeout(SOCKETS_TIMEOUT_SLOW)
 		try:
-			response = recv_exact(sockets[IDX_COMMAND], RESPONSE_HEADER_BYTES)
-		finally:
-			sockets[IDX_COMMAND].settimeout(orig)
-		
-		parsed = parse_header(response)
+			# A restarting server may accept and then drop the connection
+			sockets[IDX_COMMAND].sendall(handshake_message)
+			sockets[IDX_COMMAND].settimeout(SOCKETS_TIMEOUT_SLOW)
+			try:
+				response = recv_exact(sockets[IDX_COMMAND], RESPONSE_HEADER_BYTES)
+			finally:
+				sockets[IDX_COMMAND].settimeout(orig)
+			parsed = parse_header(response)
+		except (OSError, ConnectionError) as e:
+			parsed = {"error": f"connection lost during handshake: {e}"}
+
 		if parsed.get("error") or parsed["server_msg"] != ServerMessage.OK:
 			log.error(f"Handshake error: {parsed.get('error') or parsed['server_msg']}")
 			for s in sockets:
@@ -604,114 +657,273 @@ def connect_and_handshake(host: str, ports: list) -> Optional[list]:
 	return sockets
 
 
+class PacketReader:
+	"""
+	Frame header [+ length + body] packets out of a stream socket.
+
+	Bytes are received in bulk into a preallocated buffer and packets are
+	consumed by advancing a read index, so nothing is re-copied per packet,
+	however many packets one recv brings in. Once everything is consumed the
+	indices simply rewind; unread bytes are only moved back to the front once
+	the read index has passed the middle of the buffer (always fewer bytes
+	than were consumed) or a packet would not fit. A buffer grown for one large
+	packet (e.g. a FULL_TRIAL) shrinks back to `capacity` once drained.
+	"""
+
+	def __init__(self, sock: socket.socket, capacity: int = 1 << 20):
+		self.sock = sock
+		self.capacity = capacity
+		self.buf = bytearray(capacity)
+		self.view = memoryview(self.buf)
+		self.head = 0  # first unread byte
+		self.tail = 0  # end of received bytes
+
+	def _compact(self) -> None:
+		unread = self.tail - self.head
+		self.view[:unread] = self.view[self.head:self.tail]
+		self.head, self.tail = 0, unread
+
+	def _grow(self, size: int) -> None:
+		unread = self.tail - self.head
+		buf = bytearray(max(size, 2 * len(self.buf)))
+		buf[:unread] = self.view[self.head:self.tail]
+		self.buf, self.view = buf, memoryview(buf)
+		self.head, self.tail = 0, unread
+
+	def _ensure(self, n: int) -> None:
+		"""Receive until at least n unread bytes are buffered."""
+		while self.tail - self.head < n:
+			if n > len(self.buf):
+				self._grow(n)
+			elif self.head + n > len(self.buf):
+				self._compact()
+
+			received = self.sock.recv_into(self.view[self.tail:])
+			if not received:
+				raise ConnectionError("Socket closed unexpectedly while reading")
+			self.tail += received
+
+	def next_packet(self) -> tuple[dict, Optional[memoryview]]:
+		"""
+		Return the next (parsed header, body) pair.
+
+		The body is a view into the receive buffer: it is only valid until the
+		next call. Raises socket.timeout with the partial packet kept buffered, and
+		ConnectionError if a header declares a body over MAX_BODY_BYTES.
+		"""
+		if self.head == self.tail:
+			self.head = self.tail = 0
+			if len(self.buf) > self.capacity:
+				self.buf = bytearray(self.capacity)
+				self.view = memoryview(self.buf)
+		elif self.head > len(self.buf) // 2:
+			self._compact()
+
+		self._ensure(RESPONSE_HEADER_BYTES)
+		parsed = parse_header(self.buf, self.head)
+		if "error" in parsed or parsed["data_type"] == DataType.NONE_TYPE:
+			self.head += RESPONSE_HEADER_BYTES
+			return parsed, None
+
+		self._ensure(RESPONSE_HEADER_BYTES + 8)
+		body_length = parse_data_length(self.buf, self.head + RESPONSE_HEADER_BYTES)
+		if body_length > MAX_BODY_BYTES:
+			# Nothing sane can follow; tear the session down so the supervisor reconnects
+			raise ConnectionError(f"Declared body length {body_length} exceeds {MAX_BODY_BYTES} bytes (stream out of sync)")
+
+		self._ensure(RESPONSE_HEADER_BYTES + 8 + body_length)
+		start = self.head + RESPONSE_HEADER_BYTES + 8
+		self.head = start + body_length
+		return parsed, self.view[start:self.head]
+
+
 
 # ----------------------------- Live Data Handling -----------------------------
 
-def listen_to_live_data(sock: socket.socket, stop_event: threading.Event) -> None:
-	"""Listen for live data packets and send them via OSC."""
-	sock.settimeout(SOCKETS_TIMEOUT)
-	log.info(f"Sending live data via OSC on {OSC_IP}:{OSC_PORT}")
+def forward_live_data(body: bytes, last_sent_ts: dict) -> None:
+	"""Decode one live data packet and send the new samples of the selected sensors via OSC."""
+	try:
+		decoded = loads_json(body)
+	except json.JSONDecodeError:
+		log.error("JSON decode error; skipping this packet.")
+		return
+
+	# Snapshot globals into locals once per packet (LOAD_FAST in the sample loop);
+	# sensor changes from Max apply from the next packet on
+	addresses = SENSOR_ADDRESSES
+	multiplier = DATA_MULTIPLIER
+	max_messages = OSC_BUNDLE_MAX_MESSAGES
+	new_message, send_bundle = OscMessageBuilder, send_osc_bundle
+
+	bundle, count = OscBundleBuilder(IMMEDIATELY), 0
+	for key, payload in decoded.items():
+		entries = payload.get('data', {}).get('data', [])
+		last_ts = last_sent_ts.get(key)
+
+		# A window entirely older than what was sent means the device clock restarted
+		if last_ts is not None and entries and entries[-1][0] < last_ts:
+			last_ts = None
+
+		# (channel index, address) pairs, resolved once per channel count
+		picks, picks_width = [], None
+
+		for entry in entries:
+			timestamp, channels = entry[0], entry[1]
+			
+			# Timestamps are monotonic per device: skip what was already sent
+			if last_ts is not None and timestamp <= last_ts:
+				continue
+			last_ts = timestamp
+
+			if len(channels) != picks_width:
+				picks_width = len(channels)
+				picks = [(ch - 1, addr) for ch, addr in addresses.items() if 1 <= ch <= picks_width]
+
+			for idx, addr in picks:
+				msg = new_message(address=addr)
+				msg.add_arg(channels[idx] * multiplier)
+				bundle.add_content(msg.build())
+				count += 1
+
+				if count == max_messages:
+					send_bundle(bundle)
+					bundle, count = OscBundleBuilder(IMMEDIATELY), 0
+
+		if last_ts is not None:
+			last_sent_ts[key] = last_ts
+
+	if count:
+		send_bundle(bundle)
 
-	sent_timestamps = set()
-	sent_order = deque(maxlen=10000)
+
+def forward_live_analyses(body: bytes, addresses: dict) -> None:
+	"""Decode one live analyses packet and send its values via OSC."""
+	try:
+		decoded = loads_json(body)
+	except json.JSONDecodeError:
+		log.error("JSON decode error in live analyses; skipping this packet")
+		return
+
+	for key, analysis in decoded.get("data", {}).items():
+		addr = addresses.get(key)
+		if addr is None:
+			addr = addresses[key] = "/" + key.replace(" ", "_")
+		# analysis might be [timestamp, scalar] or [timestamp, [a,b,c]]
+		if isinstance(analysis, list) and len(analysis) >= 2:
+			vals = analysis[1]
+			# wrap a scalar in a list
+			if not isinstance(vals, list):
+				vals = [vals]
+			for v in vals:
+				send_osc_message(addr, v)
+		else:
+			# if it's a dict, flatten:
+			if isinstance(analysis, dict):
+				for subkey, v in analysis.items():
+					send_osc_message(f"{addr}/{subkey}", v)
+			else:
+				log.error(f"Unexpected format for analysis '{key}': {analysis}")
+
+
+def _enqueue_packet(packets: queue.SimpleQueue, body: memoryview) -> int:
+	"""
+	Queue a copy of a packet body, dropping the oldest ones if the decoder falls behind.
+	Returns the number of packets dropped.
+	"""
+	dropped = 0
+	while packets.qsize() >= LIVE_QUEUE_MAX_PACKETS:
+		try:
+			packets.get_nowait()
+		except queue.Empty:
+			break
+		dropped += 1
+	packets.put(bytes(body))
+	return dropped
+
+
+def _decode_worker(name: str, packets: queue.SimpleQueue, forward: Callable[[bytes], None]) -> None:
+	"""Drain queued packet bodies into `forward` until the None sentinel arrives."""
+	while True:
+		body = packets.get()
+		if body is None:
+			return
+		try:
+			forward(body)
+		except Exception as e:
+			log.error(f"Error forwarding {name} packet: {e}")
+
+
+def _listen_and_forward(sock: socket.socket, stop_event: threading.Event, name: str, 
+	forward: Callable[[bytes], None]) -> None:
+	"""
+	Frame packets from a live socket on this thread and hand their bodies to a decoder
+	thread, so JSON parsing and OSC output never hold up the recv loop.
+	"""
+	packets = queue.SimpleQueue()
+	worker = threading.Thread(target=_decode_worker, args=(name, packets, forward), daemon=True)
+	worker.start()
+	reader = PacketReader(sock)
+	last_packet = time.monotonic()
+	stalled = False
+	dropped = 0
+	last_drop_log = 0.0
 
 	try:
 		while not stop_event.is_set():
 			try:
-				header = recv_exact(sock, RESPONSE_HEADER_BYTES)
+				parsed, body = reader.next_packet()
 			except socket.timeout:
+				# Connected but silent: say so once instead of looking like an OSC problem
+				if not stalled and time.monotonic() - last_packet > LIVE_STALL_WARNING:
+					log.warning(f"No live {name} packets for {LIVE_STALL_WARNING:.0f} s")
+					stalled = True
 				continue  # check stop_event again
 
-			parsed = parse_header(header)
-			if parsed["data_type"] != DataType.NONE_TYPE:
-				try:
-					length_bytes = recv_exact(sock, 8)
-					body_length = parse_data_length(length_bytes)
-					body = recv_exact(sock, body_length)
-				except socket.timeout:
-					continue
+			last_packet = time.monotonic()
+			if stalled:
+				log.info(f"Live {name} packets resumed")
+				stalled = False
 
-				try:
-					decoded = json.loads(body.decode('utf-8'))
-					for key, payload in decoded.items():
-						for entry in payload.get('data', {}).get('data', []):
-							timestamp, channels = entry[0], entry[1]
-							
-							if timestamp in sent_timestamps:
-								continue
-							
-							sent_timestamps.add(timestamp)
-							sent_order.append(timestamp)
-								
-							if len(sent_timestamps) > sent_order.maxlen:
-								old = sent_order.popleft()
-								sent_timestamps.discard(old)
-
-							for ch in CURRENT_SENSORS:
-								if 1 <= ch <= len(channels):
-									send_osc_message(f'/sensor_{ch}', channels[ch-1] * DATA_MULTIPLIER)
-
-				except json.JSONDecodeError:
-					log.error("JSON decode error; skipping this packet.")
+			if "error" in parsed:
+				log.error(f"Live {name} header error: {parsed['error']}")
+				continue
+
+			if body is not None:
+				dropped += _enqueue_packet(packets, body)
+
+			# Rate-limited, so a slow decoder doesn't also flood the log
+			if dropped and last_packet - last_drop_log >= LIVE_DROP_LOG_INTERVAL:
+				log.warning(f"Live {name} decoder falling behind: dropped {dropped} packets "
+					f"(queue capped at {LIVE_QUEUE_MAX_PACKETS})")
+				dropped = 0
+				last_drop_log = last_packet
 
 	except (ConnectionError, socket.error) as e:
-		log.error(f"Live data socket closed: {e}")
+		log.error(f"Live {name} socket closed: {e}")
 
 	finally:
+		packets.put(None)
+		worker.join(timeout=SOCKETS_TIMEOUT)
 		sock.close()
-		log.info("Live data connection closed")
+		log.info(f"Live {name} connection closed")
 
 
-def listen_to_live_analyses(sock: socket.socket, stop_event: threading.Event) -> None:
-	"""Listen for live analyses packets and send them via OSC."""
+def listen_to_live_data(sock: socket.socket, stop_event: threading.Event) -> None:
+	"""Listen for live data packets and send them via OSC."""
 	sock.settimeout(SOCKETS_TIMEOUT)
-	log.info(f"Sending live analyses via OSC on {OSC_IP}:{OSC_PORT}")
+	log.info(f"Sending live data via OSC on {OSC_IP}:{OSC_PORT}")
 
-	try:
-		while not stop_event.is_set():
-			try:
-				header = recv_exact(sock, RESPONSE_HEADER_BYTES)
-			except socket.timeout:
-				continue  # check _stop_event again
+	last_sent_ts: dict = {}  # device -> newest timestamp forwarded (windows overlap)
+	_listen_and_forward(sock, stop_event, "data", lambda body: forward_live_data(body, last_sent_ts))
 
-			parsed = parse_header(header)
-			if parsed["data_type"] != DataType.NONE_TYPE:
-				try:
-					length_bytes = recv_exact(sock, 8)
-					body_length = parse_data_length(length_bytes)
-					body = recv_exact(sock, body_length)
-				except socket.timeout:
-					continue
 
-				try:
-					decoded = json.loads(body.decode('utf-8'))
-					for key, analysis in decoded.get("data", {}).items():
-						addr = "/" + key.replace(" ", "_")
-						# analysis might be [timestamp, scalar] or [timestamp, [a,b,c]]
-						if isinstance(analysis, list) and len(analysis) >= 2:
-							vals = analysis[1]
-							# wrap a scalar in a list
-							if not isinstance(vals, list):
-								vals = [vals]
-							for v in vals:
-								send_osc_message(addr, v)
-						else:
-							# if it's a dict, flatten:
-							if isinstance(analysis, dict):
-								for subkey, v in analysis.items():
-									send_osc_message(f"{addr}/{subkey}", v)
-							else:
-								log.error(f"Unexpected format for analysis '{key}': {analysis}")
-				
-				except json.JSONDecodeError:
-					log.error("JSON decode error in live analyses; skipping this packet")
+def listen_to_live_analyses(sock: socket.socket, stop_event: threading.Event) -> None:
+	"""Listen for live analyses packets and send them via OSC."""
+	sock.settimeout(SOCKETS_TIMEOUT)
+	log.info(f"Sending live analyses via OSC on {OSC_IP}:{OSC_PORT}")
 
-	except (ConnectionError, socket.error) as e:
-		log.error(f"Live analysis socket closed: {e}")
-	
-	finally:
-		sock.close()
-		log.info("Live analysis connection closed")
+	addresses: dict = {}  # analysis key -> OSC address
+	_listen_and_forward(sock, stop_event, "analyses", lambda body: forward_live_analyses(body, addresses))
 
 
 
@@ -726,6 +938,9 @@ def start_osc_server() -> tuple[BlockingOSCUDPServer, threading.Thread]:
 	dispatcher.map("/analyzer_learningrate", analyzer_update_learningrate)
 	dispatcher.map("/record", osc_record_handler)
 
+	# One dispatch thread keeps handlers in arrival order; slow work (analyzer pushes,
+	# /record round-trips) is handed off so it doesn't stall reading the UDP socket
+	threading.Thread(target=_record_worker, daemon=True).start()
 	server = BlockingOSCUDPServer((ANALYZER_IP, ANALYZER_PORT), dispatcher)
 	thread = threading.Thread(target=server.serve_forever, daemon=True)
 	thread.start()
@@ -734,18 +949,26 @@ def start_osc_server() -> tuple[BlockingOSCUDPServer, threading.Thread]:
 
 
 def send_osc_message(address: str, value: object) -> None:
-	"""Thread-safe function to send OSC messages."""
-	with osc_lock:
-		osc_client.send_message(address, value)
+	"""
+	Send an OSC message. No lock: each call is a single UDP sendto, which the
+	data, analyses and dispatcher threads can issue concurrently.
+	"""
+	osc_client.send_message(address, value)
+
+
+def send_osc_bundle(bundle: OscBundleBuilder) -> None:
+	"""Send a bundle of OSC messages as one datagram (lock-free, like send_osc_message)."""
+	osc_client.send(bundle.build())
 
 
 def change_current_sensors(address: str, *args) -> None:
 	"""Handles incoming OSC messages to change the current sensor."""
-	global CURRENT_SENSORS
+	global CURRENT_SENSORS, SENSOR_ADDRESSES
 
 	try:
 		with osc_lock:
 			CURRENT_SENSORS = [int(arg) for arg in args]
+			SENSOR_ADDRESSES = {ch: f'/sensor_{ch}' for ch in CURRENT_SENSORS}
 
 		log.info(f"Changed current sensors to {CURRENT_SENSORS}")
 
@@ -772,7 +995,7 @@ def analyzer_update_channels(address: str, *args) -> None:
 			else:
 				raise IndexError("No channel data provided.")
 
-		send_analyzer_config()
+		schedule_analyzer_config()
 
 	except (ValueError, IndexError) as e:
 		log.error(f"Error updating ANALYZER_CHANNEL: {e}")
@@ -796,7 +1019,7 @@ def analyzer_update_thresholds(address: str, *args) -> None:
 			else:
 				raise IndexError("No threshold data provided.")
 
-		send_analyzer_config()
+		schedule_analyzer_config()
 
 	except (ValueError, IndexError) as e:
 		log.error(f"Error updating ANALYZER_THRESHOLDS: {e}")
@@ -810,14 +1033,33 @@ def analyzer_update_learningrate(address: str, *args) -> None:
 		with osc_lock:
 			ANALYZER_LEARNING_RATE = float(args[0])
 
-		send_analyzer_config()
+		schedule_analyzer_config()
 		log.info(f"Updated ANALYZER_LEARNING_RATE: {ANALYZER_LEARNING_RATE}")
 
 	except (ValueError, IndexError) as e:
 		log.error(f"Error updating ANALYZER_LEARNING_RATE: {e}")
 
 
+# /record requests, run one at a time and in arrival order by _record_worker
+_record_requests: queue.SimpleQueue = queue.SimpleQueue()
+
+
 def osc_record_handler(address: str, *args) -> None:
+	"""Queue a /record request so its server round-trips don't block the OSC dispatcher."""
+	_record_requests.put(args)
+
+
+def _record_worker() -> None:
+	"""Run queued /record requests sequentially, so a start and a stop never overlap."""
+	while True:
+		args = _record_requests.get()
+		try:
+			_handle_record(*args)
+		except Exception as e:
+			log.error(f"Error handling /record: {e}")
+
+
+def _handle_record(*args) -> None:
 	"""
 	/record 1 [outdir] [basename] -> START_RECORDING
 	/record 0 [outdir] [basename] -> STOP_RECORDING, then GET_LAST_TRIAL_DATA and save CSV
@@ -1105,18 +1347,29 @@ def update_analyzer_config() -> None:
 	global analyzer_config_left, ANALYZER_LEFT_CHANNEL, ANALYZER_LEFT_THRESHOLD
 	global analyzer_config_right, ANALYZER_RIGHT_CHANNEL, ANALYZER_RIGHT_THRESHOLD
 
+	sides = (
+		("left", analyzer_config_left, ANALYZER_LEFT_CHANNEL, ANALYZER_LEFT_THRESHOLD),
+		("right", analyzer_config_right, ANALYZER_RIGHT_CHANNEL, ANALYZER_RIGHT_THRESHOLD),
+	)
+
 	with osc_lock:
-		# Left
-		analyzer_config_left["events"][0]["start_when"][0]["channel"] = ANALYZER_LEFT_CHANNEL
-		analyzer_config_left["events"][0]["start_when"][0]["value"] = ANALYZER_LEFT_THRESHOLD
-		analyzer_config_left["events"][1]["start_when"][0]["channel"] = ANALYZER_LEFT_CHANNEL
-		analyzer_config_left["events"][1]["start_when"][0]["value"] = ANALYZER_LEFT_THRESHOLD
+		for side, config, channel, threshold in sides:
+			conditions = [event["start_when"][0] for event in config["events"]]
+			if all(c["channel"] == channel and c["value"] == threshold for c in conditions):
+				continue
+
+			for c in conditions:
+				c["channel"] = channel
+				c["value"] = threshold
+			_analyzer_json[side] = None
 
-		# Right
-		analyzer_config_right["events"][0]["start_when"][0]["channel"] = ANALYZER_RIGHT_CHANNEL
-		analyzer_config_right["events"][0]["start_when"][0]["value"] = ANALYZER_RIGHT_THRESHOLD
-		analyzer_config_right["events"][1]["start_when"][0]["channel"] = ANALYZER_RIGHT_CHANNEL
-		analyzer_config_right["events"][1]["start_when"][0]["value"] = ANALYZER_RIGHT_THRESHOLD
+
+def analyzer_config_json(side: str, config: dict) -> bytes:
+	"""Return the encoded analyzer config of a side, re-encoding only after it changed."""
+	with osc_lock:
+		if _analyzer_json[side] is None:
+			_analyzer_json[side] = json.dumps(config).encode('utf-8')
+		return _analyzer_json[side]
 
 
 def _remove_analyzer(side: str, cmd_sock: socket.socket, msg_sock: socket.socket, config: dict) -> bool:
@@ -1140,16 +1393,17 @@ def _remove_analyzer(side: str, cmd_sock: socket.socket, msg_sock: socket.socket
 	return True
 
 
-def _add_analyzer(side: str, cmd_sock: socket.socket, msg_sock: socket.socket, config: dict) -> bool:
+def _add_analyzer(side: str, cmd_sock: socket.socket, msg_sock: socket.socket, config: dict, 
+	config_json: bytes) -> bool:
 	"""
-	Send ADD_ANALYZER + full config.
+	Send ADD_ANALYZER + full config (already encoded).
 	Returns True on success.
 	"""
 	if not send_command(cmd_sock, Command.ADD_ANALYZER):
 		log.error(f"Failed to send ADD_ANALYZER command for {side} analyzer")
 		return False
 
-	if not send_extra_data(cmd_sock, msg_sock, config):
+	if not send_extra_data(cmd_sock, msg_sock, config_json):
 		log.error(f"Failed to send configuration for {side} analyzer")
 		return False
 
@@ -1158,7 +1412,25 @@ def _add_analyzer(side: str, cmd_sock: socket.socket, msg_sock: socket.socket, c
 
 
 def send_analyzer_config() -> None:
-	"""Send the updated analyzer configuration to the server."""
+	"""Send the updated analyzer configuration to the server (one push at a time)."""
+	with config_lock:
+		_send_analyzer_config()
+
+
+def schedule_analyzer_config() -> None:
+	"""(Re)arm a short timer so a burst of updates sends the analyzer configuration once."""
+	global _config_push_timer
+
+	with _config_push_lock:
+		if _config_push_timer is not None:
+			_config_push_timer.cancel()
+		_config_push_timer = threading.Timer(CONFIG_PUSH_DEBOUNCE, send_analyzer_config)
+		_config_push_timer.daemon = True
+		_config_push_timer.start()
+
+
+def _send_analyzer_config() -> None:
+	"""Push the analyzer configuration; the caller holds config_lock."""
 	global SOCKETS
 
 	if not SOCKETS or len(SOCKETS) < 2:
@@ -1169,10 +1441,10 @@ def send_analyzer_config() -> None:
 	msg_sock = SOCKETS[IDX_MESSAGE]
 
 	# One-time function attribute initialization
-	if not hasattr(send_analyzer_config, "_cache"):
-		send_analyzer_config._cache = {
-			"left": {"active": False, "config": None},
-			"right": {"active": False, "config": None}
+	if not hasattr(_send_analyzer_config, "_cache"):
+		_send_analyzer_config._cache = {
+			"left": {"active": False, "config": None, "json": None},
+			"right": {"active": False, "config": None, "json": None}
 	}
 
 	update_analyzer_config()
@@ -1181,23 +1453,26 @@ def send_analyzer_config() -> None:
 		"left": (ANALYZER_LEFT_CHANNEL, analyzer_config_left),
 		"right": (ANALYZER_RIGHT_CHANNEL, analyzer_config_right),
 	}
-	cache = send_analyzer_config._cache
+	cache = _send_analyzer_config._cache
 	
 	for side, (channel, config) in sides.items():
 		entry = cache[side]
 		was_active = entry["active"]
 		last_config = entry["config"]
+		last_json = entry["json"]
 
 		if channel is None:
 			if was_active:
 				if _remove_analyzer(side, cmd_sock, msg_sock, last_config):
 					entry["active"] = False
 					entry["config"] = None
+					entry["json"] = None
 			else:
 				log.warning(f"No {side} analyzer to remove; skipping.")
 			continue
 
-		if was_active and last_config == config:
+		config_json = analyzer_config_json(side, config)
+		if was_active and last_json == config_json:
 			log.warning(f"No change in {side} analyzer; skipping.")
 			continue
 
@@ -1205,9 +1480,27 @@ def send_analyzer_config() -> None:
 			if not _remove_analyzer(side, cmd_sock, msg_sock, last_config):
 				continue
 
-		if _add_analyzer(side, cmd_sock, msg_sock, config):
+		if _add_analyzer(side, cmd_sock, msg_sock, config, config_json):
 			entry["active"] = True
-			entry["config"] = copy.deepcopy(config)
+			entry["config"] = {"name": config["name"]}
+			entry["json"] = config_json
+
+
+
+def resync_analyzer_cache(states: Optional[dict]) -> None:
+	"""
+	After a reconnect, forget analyzers the server no longer reports so they are re-added.
+	Unknown states (GET_STATES timed out) count as reporting none.
+	"""
+	if not hasattr(_send_analyzer_config, "_cache"):
+		return
+
+	analyzers = (states or {}).get("connected_analyzers") or {}
+	for side, entry in _send_analyzer_config._cache.items():
+		if entry["active"] and entry["config"]["name"] not in analyzers:
+			entry["active"] = False
+			entry["config"] = None
+			entry["json"] = None
 
 
 
@@ -1242,8 +1535,7 @@ def _handle_states(parsed, body) -> None:
 			return
 		
 		# parse body
-		json_str = body.decode("utf-8")
-		data = json.loads(json_str)
+		data = loads_json(body)
 
 		rec = _get_emg_is_recording(data)
 		
@@ -1282,8 +1574,7 @@ def _handle_states(parsed, body) -> None:
 			log.warning("States unchanged; skipping forward")
 			return
 
-		with osc_lock:
-			osc_client.send_message("/states", json_str)
+		send_osc_message("/states", str(body, "utf-8"))
 		log.info("Forwarded /states to Max")
 	
 	except Exception as e:
@@ -1313,7 +1604,7 @@ def _handle_full_trial(parsed, body) -> None:
 			log.warning("FULL_TRIAL received but no pending save requested; ignoring.")
 			return
 
-		data = json.loads(body.decode("utf-8"))
+		data = loads_json(body)
 		files = save_trial_to_csv(data, info["outdir"], info["basename"])
 
 		# Clear pending
@@ -1324,8 +1615,7 @@ def _handle_full_trial(parsed, body) -> None:
 		_trial_retry_attempts = 0
 		_suspend_states_until = 0.0
 
-		with osc_lock:
-			osc_client.send_message("/record_saved", files or [""])
+		send_osc_message("/record_saved", files or [""])
 
 	except Exception as e:
 		log.error(f"Error handling FULL_TRIAL: {e}")
@@ -1353,6 +1643,7 @@ MESSAGE_HANDLERS: dict[Enum, Callable] = {
 def message_dispatcher(sock: socket.socket, stop_event: threading.Event) -> None:
 	sock.setblocking(True)
 	sock.settimeout(SOCKETS_TIMEOUT)
+	reader = PacketReader(sock)
 
 	while not stop_event.is_set():	
 		if msg_lock.locked():
@@ -1360,35 +1651,25 @@ def message_dispatcher(sock: socket.socket, stop_event: threading.Event) -> None
 			continue
 
 		try:
-			# parse header & body
+			# parse header & body (a partial body stays buffered across timeouts)
 			try:
-				header = recv_exact(sock, RESPONSE_HEADER_BYTES)
+				parsed, body = reader.next_packet()
 			except socket.timeout:
 				continue
+			except (ConnectionError, socket.error) as e:
+				log.error(f"Message socket closed: {e}")
+				break
+			except Exception as e:
+				# The packet is still buffered, so retrying would fail the same way forever
+				log.error(f"Message stream unreadable: {e!r}")
+				break
 
-			parsed = parse_header(header)
 			if parsed.get("error"):
 				log.error(f"Header parse error: {parsed['error']}")
 				continue
 
-			# read body if present
-			body = None
-			if parsed["data_type"] != DataType.NONE_TYPE:
-				orig = sock.gettimeout()
-				try:
-					sock.settimeout(SOCKETS_TIMEOUT_SLOW)
-					length_bytes = recv_exact(sock, 8)
-					body_len = parse_data_length(length_bytes)
-					
-					if parsed["data_type"] == DataType.FULL_TRIAL:
-						log.info(f"FULL_TRIAL header on message socket (len={body_len})")
-
-					body = recv_exact(sock, body_len)
-				except socket.timeout:
-					log.warning(f"Timed out reading {parsed['data_type'].name} body; dropping packet")
-					continue
-				finally:
-					sock.settimeout(orig)
+			if parsed["data_type"] == DataType.FULL_TRIAL:
+				log.info(f"FULL_TRIAL on message socket (len={len(body)})")
 
 			# pick a handler by server_msg first, then data_type
 			handler = (
@@ -1399,7 +1680,8 @@ def message_dispatcher(sock: socket.socket, stop_event: threading.Event) -> None
 			handler(parsed, body)
 
 		except Exception as e:
-			log.warning(f"Message dispatcher error: {e}")
+			# Handler failure: the packet was already consumed, so move on to the next one
+			log.warning(f"Message dispatcher error: {e!r}")
 			continue
 
 
@@ -1482,38 +1764,24 @@ def request_states() -> Optional[dict]:
 
 # ----------------------------- Main -----------------------------
 
-def main():
-	"""Main function to parse CLI args, establish connections and start data processing."""
-
-	# Parse server ports
-	parser = argparse.ArgumentParser(description="TCP/OSC bridge: specify Delsys EMG ports to use")
-	parser.add_argument("--portCommand", type=int, default=5000, help="EMG command port")
-	parser.add_argument("--portMessage", type=int, default=5001, help="EMG message port")
-	parser.add_argument("--portLiveData", type=int, default=5002, help="EMG data stream port")
-	parser.add_argument("--portLiveAnalyses", type=int, default=5003, help="EMG analyses stream port")
-	args, _ = parser.parse_known_args()
-
-	# Override the default ports
-	global EMG_PORTS
-	EMG_PORTS = [
-		args.portCommand,
-		args.portMessage,
-		args.portLiveData,
-		args.portLiveAnalyses,
-	]
-
-	# Establish connections with handshake
+def start_session() -> Optional[tuple[threading.Event, list]]:
+	"""
+	Connect and handshake with the server, then start the message dispatcher and the
+	live listeners. Returns (session stop event, threads), or None on failure.
+	"""
 	global SOCKETS
 	SOCKETS = connect_and_handshake(EMG_HOST, EMG_PORTS)
 
 	if not SOCKETS:
-		log.error("Failed to establish all connections. Exiting...")
-		return
+		log.error("Failed to establish all connections.")
+		return None
+
+	session_stop = threading.Event()
 
 	# Start message dispatcher thread
 	reader_thread = threading.Thread(
 		target=message_dispatcher,
-		args=(SOCKETS[IDX_MESSAGE], stop_event),
+		args=(SOCKETS[IDX_MESSAGE], session_stop),
 		daemon=True
 	)
 	reader_thread.start()
@@ -1524,57 +1792,130 @@ def main():
 		log.info(f"EMG already connected ({EMG_DEVICE_KEY}); skipping connect.")
 	else:
 		if not send_command(SOCKETS[IDX_COMMAND], Command.CONNECT_DELSYS_EMG):
-			log.error("Failed to send CONNECT_DELSYS_EMG command. Exiting...")
-			stop_event.set()
-			reader_thread.join(timeout=SOCKETS_TIMEOUT)
-			for sock in SOCKETS:
-				try:
-					sock.close()
-				except Exception:
-					pass
-			return
+			log.error("Failed to send CONNECT_DELSYS_EMG command.")
+			stop_session(session_stop, [reader_thread])
+			return None
 
 	# Start live data listener thread
 	data_thread = threading.Thread(
 		target=listen_to_live_data, 
-		args=(SOCKETS[IDX_LIVE_DATA], stop_event), 
+		args=(SOCKETS[IDX_LIVE_DATA], session_stop), 
 		daemon=True
 	)
 	data_thread.start()
 
 	# Send analyzer config (only if channel != None)
+	resync_analyzer_cache(states)
 	send_analyzer_config()
 
 	# Start live analyses listener thread
 	analyses_thread = threading.Thread(
 		target=listen_to_live_analyses, 
-		args=(SOCKETS[IDX_LIVE_ANALYSES], stop_event), 
+		args=(SOCKETS[IDX_LIVE_ANALYSES], session_stop), 
 		daemon=True
 	)
 	analyses_thread.start()
 
+	return session_stop, [reader_thread, data_thread, analyses_thread]
+
+
+def stop_session(session_stop: threading.Event, threads: list) -> None:
+	"""Stop the session threads and close its sockets."""
+	global SOCKETS, LAST_STATES
+
+	session_stop.set()
+	for thread in threads:
+		thread.join(timeout=SOCKETS_TIMEOUT_SLOW)
+
+	for sock in SOCKETS or []:
+		try:
+			sock.close()
+		except Exception:
+			pass
+	SOCKETS = []
+
+	# States describe this session only; the next one must not resync from them
+	LAST_STATES = None
+
+
+def reconnect() -> Optional[tuple[threading.Event, list]]:
+	"""Retry start_session with exponential backoff until it succeeds or we shut down."""
+	delay = RECONNECT_DELAY_MIN
+	while not stop_event.is_set():
+		try:
+			session = start_session()
+		except (OSError, ConnectionError) as e:
+			log.error(f"Error while reconnecting: {e}")
+			stop_session(threading.Event(), [])
+			session = None
+
+		if session:
+			log.info("Reconnected to the server")
+			return session
+
+		log.warning(f"Reconnect failed; retrying in {delay:.0f} s")
+		if stop_event.wait(delay):
+			break
+		delay = min(delay * 2, RECONNECT_DELAY_MAX)
+	return None
+
+
+def main():
+	"""Main function to parse CLI args, establish connections and start data processing."""
+
+	# Parse server ports
+	parser = argparse.ArgumentParser(description="TCP/OSC bridge: specify Delsys EMG ports to use")
+	parser.add_argument("--portCommand", type=int, default=5000, help="EMG command port")
+	parser.add_argument("--portMessage", type=int, default=5001, help="EMG message port")
+	parser.add_argument("--portLiveData", type=int, default=5002, help="EMG data stream port")
+	parser.add_argument("--portLiveAnalyses", type=int, default=5003, help="EMG analyses stream port")
+	args, _ = parser.parse_known_args()
+
+	# Override the default ports
+	global EMG_PORTS
+	EMG_PORTS = [
+		args.portCommand,
+		args.portMessage,
+		args.portLiveData,
+		args.portLiveAnalyses,
+	]
+
+	# Establish connections with handshake and start the session threads
+	session = start_session()
+	if not session:
+		log.error("Failed to start the session. Exiting...")
+		return
+
 	# Start the OSC listener to change analyzer configuration
 	osc_server, osc_thread = start_osc_server()
 
 	try:
 		log.info("Connections established. Running... Press Ctrl+C to exit.")
-		stop_event.wait()
+
+		# Supervise the session: a dead socket thread means the server dropped us
+		while not stop_event.wait(SOCKETS_TIMEOUT):
+			session_stop, threads = session
+			if all(thread.is_alive() for thread in threads):
+				continue
+
+			log.warning("Lost connection to the server; reconnecting...")
+			stop_session(session_stop, threads)
+			session = reconnect()
+			if not session:
+				break
 	
 	except KeyboardInterrupt:
 		log.info("\nShutting down...")
 		stop_event.set()
-		osc_server.shutdown()
-		osc_server.server_close()
 	
 	finally:
-		data_thread.join()
-		analyses_thread.join()
-		reader_thread.join()
+		if session:
+			stop_session(*session)
+
+		osc_server.shutdown()
+		osc_server.server_close()
 		osc_thread.join()
 		
-		for sock in SOCKETS:
-			sock.close()
-		
 		log.info("Connections closed")
 
 